@@ -18,7 +18,7 @@ from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton,
                             QListWidget, QListWidgetItem, QLabel, QFormLayout, QLineEdit, 
                             QDialog, QDialogButtonBox, QStyledItemDelegate, QMessageBox, QStyle, QMenu, QSizePolicy)
 from PyQt5.QtGui import QColor, QLinearGradient, QPainter, QPixmap, QIcon
-from PyQt5.QtCore import Qt, QSize, QPoint, QEvent, QRect
+from PyQt5.QtCore import Qt, QSize, QPoint, QEvent, QRect, pyqtSignal
 #from core.plugin_base import BasePlugin
 import json
 import os
@@ -348,31 +348,44 @@ class ColorEditor(QDialog):
             self.color_stops  # Whether gradient or discrete, keep the same format
         )
 
-# class TreeItemDelegate(QStyledItemDelegate):
-#     def __init__(self, parent=None):
-#         super().__init__(parent)
-#         self._hover_row = -1
-#         self.delete_icon = QIcon("./icons/delete.svg")  # 需要准备关闭图标资源
-
-#     def paint(self, painter, option, index):
-#         super().paint(painter, option, index)
-#         # 在右侧绘制删除按钮
-#         if option.state & QStyle.State_MouseOver:
-#             rect = option.rect
-#             btn_size = 16
-#             btn_rect = QRect(
-#                 rect.right() - btn_size - 4,
-#                 rect.top() + (rect.height() - btn_size) // 2,
-#                 btn_size,
-#                 btn_size
-#             )
-#             self.delete_icon.paint(painter, btn_rect)
-
-#     def editorEvent(self, event, model, option, index):
-#         if event.type() == QEvent.MouseMove:
-#             self._hover_row = index.row()
-#             option.widget.viewport().update()
-#         return super().editorEvent(event, model, option, index)
+class PaletteDelegate(QStyledItemDelegate):
+    """Draws the delete button on palette items and handles clicks on it"""
+    deleteRequested = pyqtSignal(object)
+
+    BTN_SIZE = 16
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.delete_icon = QIcon("./icons/delete.svg")
+
+    def _button_rect(self, rect):
+        return QRect(
+            rect.right() - self.BTN_SIZE - 4,
+            rect.top() + (rect.height() - self.BTN_SIZE) // 2,
+            self.BTN_SIZE,
+            self.BTN_SIZE
+        )
+
+    def _palette_item(self, option, index):
+        tree = option.widget
+        if tree is None:
+            return None
+        item = tree.itemFromIndex(index)
+        return item if hasattr(item, 'colors') else None
+
+    def paint(self, painter, option, index):
+        super().paint(painter, option, index)
+        # Only leaf palette items carry a delete button
+        if self._palette_item(option, index) is not None:
+            self.delete_icon.paint(painter, self._button_rect(option.rect))
+
+    def editorEvent(self, event, model, option, index):
+        if event.type() == QEvent.MouseButtonRelease and self._button_rect(option.rect).contains(event.pos()):
+            item = self._palette_item(option, index)
+            if item is not None:
+                self.deleteRequested.emit(item)
+                return True
+        return super().editorEvent(event, model, option, index)
 
 class CustomPalettePlugin(QWidget):
     def __init__(self, plugin_path=None, config=None):
@@ -432,9 +445,10 @@ class CustomPalettePlugin(QWidget):
         self.refresh_tree()
         layout.addWidget(self.tree)
 
-        # self.tree.setItemDelegate(TreeItemDelegate(self.tree))
+        self.delegate = PaletteDelegate(self.tree)
+        self.delegate.deleteRequested.connect(self.delete_item)
+        self.tree.setItemDelegate(self.delegate)
         self.tree.setMouseTracking(True)  # Enable mouse tracking
-        self.tree.viewport().installEventFilter(self)  # Install event filter
         self.tree.itemDoubleClicked.connect(self.on_item_double_clicked)  # Add double click event connection
         
         widget.setWidget(container)
@@ -827,25 +841,6 @@ class CustomPalettePlugin(QWidget):
         with open(path, 'w', encoding='utf-8') as f:
             json.dump(save_data, f, indent=2)
 
-    def eventFilter(self, source, event):
-        if source is self.tree.viewport() and event.type() == QEvent.MouseButtonRelease:
-            index = self.tree.indexAt(event.pos())
-            if index.isValid():
-                item = self.tree.itemFromIndex(index)
-                # Calculate delete button area
-                rect = self.tree.visualRect(index)
-                btn_size = 16
-                btn_rect = QRect(
-                    rect.right() - btn_size - 4,
-                    rect.top() + (rect.height() - btn_size) // 2,
-                    btn_size,
-                    btn_size
-                )
-                if btn_rect.contains(event.pos()):
-                    self.delete_item(item)
-                    return True
-        return super().eventFilter(source, event)
-
     def delete_item(self, item):
         if hasattr(item, 'colors'):
             # Get parent node type (gradient or discrete)
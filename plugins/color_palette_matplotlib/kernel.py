@@ -14,19 +14,85 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
 
+import os
+import functools
 import numpy as np
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QScrollArea, QGroupBox,
                             QLabel, QSizePolicy, QHBoxLayout, QTreeWidget, QTreeWidgetItem,
                             QSplitter, QApplication)
-from PyQt5.QtGui import QColor, QLinearGradient, QPainter, QPixmap, QIcon, QPainterPath
+from PyQt5.QtGui import QColor, QLinearGradient, QPainter, QPixmap, QIcon, QPainterPath, QImage
 from PyQt5.QtCore import Qt, QRectF, QPoint, QSize
 # from core.plugin_base import BasePlugin
 
 try:
+    import matplotlib
     from matplotlib import colormaps
 except ImportError:
+    matplotlib = None
     colormaps = None
 
+# 按官方分类组织的色卡
+CMAP_CATEGORIES = {
+    "Perceptually Uniform Sequential": ['viridis', 'plasma', 'inferno', 'magma', 'cividis'],
+    "Sequential": ['Greys', 'Purples', 'Blues', 'Greens', 'Oranges', 'Reds',
+                  'YlOrBr', 'YlOrRd', 'OrRd', 'PuRd', 'RdPu', 'BuPu',
+                  'GnBu', 'PuBu', 'YlGnBu', 'PuBuGn', 'BuGn', 'YlGn'],
+    "Diverging": ['PiYG', 'PRGn', 'BrBG', 'PuOr', 'RdGy', 'RdBu',
+                 'RdYlBu', 'RdYlGn', 'Spectral', 'coolwarm', 'bwr', 'seismic'],
+    "Cyclic": ['twilight', 'twilight_shifted', 'hsv'],
+    "Qualitative": ['Pastel1', 'Pastel2', 'tab10', 'tab20', 'Set1', 'Set2', 'Set3',
+                   'Accent', 'Dark2', 'Paired', 'Pastel2'],
+    "Miscellaneous": ['flag', 'prism', 'ocean', 'gist_earth', 'terrain', 'gist_stern',
+                     'gnuplot', 'gnuplot2', 'CMRmap', 'cubehelix', 'brg', 'gist_rainbow',
+                     'rainbow', 'jet', 'turbo']
+}
+
+# 色卡LUT缓存文件，首次生成后后续启动直接加载；
+# 同时保存色卡名称与matplotlib版本，任一不符即重新生成
+_LUT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cmap_luts.npz')
+
+def _all_cmap_names():
+    """按分类顺序列出所有可用色卡（去重）"""
+    if colormaps is None:
+        return []
+    names = []
+    for cmaps in CMAP_CATEGORIES.values():
+        for name in cmaps:
+            if name in colormaps and name not in names:
+                names.append(name)
+    return names
+
+def _build_all_luts(names):
+    """一次性计算所有色卡的256级RGBA查找表，返回(N, 256, 4) uint8数组"""
+    if not names:
+        return np.zeros((0, 256, 4), dtype=np.uint8)
+    samples = np.linspace(0, 1, 256)
+    luts = np.stack([colormaps[name](samples) for name in names])
+    return (luts * 255).astype(np.uint8)
+
+@functools.lru_cache(maxsize=None)
+def _load_luts():
+    """加载色卡LUT，返回(名称->行号映射, LUT数组)"""
+    names = _all_cmap_names()
+    version = getattr(matplotlib, '__version__', '')
+    luts = None
+    try:
+        with np.load(_LUT_CACHE_PATH) as cached:
+            if str(cached['version']) == version and cached['names'].tolist() == names:
+                cached_luts = cached['luts']
+                if cached_luts.shape == (len(names), 256, 4) and cached_luts.dtype == np.uint8:
+                    luts = cached_luts
+    except (OSError, ValueError, KeyError):
+        pass
+    if luts is None:
+        luts = _build_all_luts(names)
+        try:
+            np.savez(_LUT_CACHE_PATH, version=np.array(version),
+                     names=np.array(names, dtype=str), luts=luts)
+        except OSError:
+            pass  # 缓存写入失败不影响使用
+    return {name: i for i, name in enumerate(names)}, luts
+
 class ColorBar(QWidget):
     def __init__(self, cmap_name, height=30):
         super().__init__()
@@ -54,10 +120,41 @@ class ColorBar(QWidget):
         painter.fillRect(rect, gradient)
 
 class ColorPalettePlugin(QWidget):
+    # 圆角遮罩与边框图层对所有色卡相同，只光栅化一次
+    _ROUNDED_MASK = None
+    _BORDER_OVERLAY = None
+
     def __init__(self):
         super().__init__()
+        self._init_icon_layers()
         self.create_widget()
 
+    @classmethod
+    def _init_icon_layers(cls):
+        """预先绘制320x40的圆角遮罩和1px边框"""
+        if cls._ROUNDED_MASK is not None:
+            return
+        path = QPainterPath()
+        path.addRoundedRect(QRectF(2, 2, 316, 36), 4, 4)
+
+        mask = QImage(320, 40, QImage.Format_ARGB32_Premultiplied)
+        mask.fill(Qt.transparent)
+        painter = QPainter(mask)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.fillPath(path, Qt.white)
+        painter.end()
+
+        border = QImage(320, 40, QImage.Format_ARGB32_Premultiplied)
+        border.fill(Qt.transparent)
+        painter = QPainter(border)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(QColor(0, 0, 0, 20))
+        painter.drawPath(path)
+        painter.end()
+
+        cls._ROUNDED_MASK = mask
+        cls._BORDER_OVERLAY = border
+
     def create_widget(self):
         # widget = QWidget()
         main_layout = QVBoxLayout()
@@ -88,23 +185,7 @@ class ColorPalettePlugin(QWidget):
             }
         """)
         
-        # 按官方分类创建节点
-        categories = {
-            "Perceptually Uniform Sequential": ['viridis', 'plasma', 'inferno', 'magma', 'cividis'],
-            "Sequential": ['Greys', 'Purples', 'Blues', 'Greens', 'Oranges', 'Reds',
-                          'YlOrBr', 'YlOrRd', 'OrRd', 'PuRd', 'RdPu', 'BuPu',
-                          'GnBu', 'PuBu', 'YlGnBu', 'PuBuGn', 'BuGn', 'YlGn'],
-            "Diverging": ['PiYG', 'PRGn', 'BrBG', 'PuOr', 'RdGy', 'RdBu',
-                         'RdYlBu', 'RdYlGn', 'Spectral', 'coolwarm', 'bwr', 'seismic'],
-            "Cyclic": ['twilight', 'twilight_shifted', 'hsv'],
-            "Qualitative": ['Pastel1', 'Pastel2', 'tab10', 'tab20', 'Set1', 'Set2', 'Set3',
-                           'Accent', 'Dark2', 'Paired', 'Pastel2'],
-            "Miscellaneous": ['flag', 'prism', 'ocean', 'gist_earth', 'terrain', 'gist_stern',
-                             'gnuplot', 'gnuplot2', 'CMRmap', 'cubehelix', 'brg', 'gist_rainbow',
-                             'rainbow', 'jet', 'turbo']
-        }
-
-        for category, cmaps in categories.items():
+        for category, cmaps in CMAP_CATEGORIES.items():
             parent = QTreeWidgetItem(self.tree)
             parent.setText(0, f"🎨 {category} ({len(cmaps)})")
             parent.setExpanded(False)
@@ -128,29 +209,19 @@ class ColorPalettePlugin(QWidget):
 
     def create_large_color_icon(self, cmap_name):
         """生成专业级色卡缩略图"""
-        pixmap = QPixmap(320, 40)  # 宽度320px 高度40px
-        painter = QPainter(pixmap)
-        painter.setRenderHint(QPainter.Antialiasing)  # 启用抗锯齿
-        
-        # 创建带圆角的渐变区域
-        rect = QRectF(2, 2, 316, 36)
-        path = QPainterPath()
-        path.addRoundedRect(rect, 4, 4)
-        
-        gradient = QLinearGradient(0, 0, 320, 0)
-        cmap = colormaps[cmap_name]
-        for i in np.linspace(0, 1, 256):
-            color = cmap(i)
-            gradient.setColorAt(i, QColor(*[int(c*255) for c in color]))
-        
-        painter.fillPath(path, gradient)
-        
-        # 添加1px边框
-        painter.setPen(QColor(0,0,0,20))
-        painter.drawPath(path)
-        
+        index, luts = _load_luts()
+        lut = QImage(luts[index[cmap_name]].tobytes(), 256, 1, 256 * 4, QImage.Format_RGBA8888)
+        image = lut.scaled(320, 40, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+        image = image.convertToFormat(QImage.Format_ARGB32_Premultiplied)
+
+        # 通过预制遮罩裁出圆角，再叠加边框
+        painter = QPainter(image)
+        painter.setCompositionMode(QPainter.CompositionMode_DestinationIn)
+        painter.drawImage(0, 0, self._ROUNDED_MASK)
+        painter.setCompositionMode(QPainter.CompositionMode_SourceOver)
+        painter.drawImage(0, 0, self._BORDER_OVERLAY)
         painter.end()
-        return QIcon(pixmap)
+        return QIcon(QPixmap.fromImage(image))
 
     def on_item_double_click(self, item, column):
         """仅保留复制功能"""
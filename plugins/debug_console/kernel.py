@@ -20,14 +20,30 @@ import logging
 import threading
 import queue
 import time
+import functools
 from datetime import datetime
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPlainTextEdit, 
                              QPushButton, QCheckBox, QLabel, QComboBox, QSpinBox,
                              QGroupBox, QFormLayout, QSplitter, QTextEdit)
-from PyQt5.QtCore import QThread, pyqtSignal, Qt, QTimer
+from PyQt5.QtCore import QThread, pyqtSlot, Qt, QTimer, QMetaObject, Q_ARG
 from PyQt5.QtGui import QFont, QTextCursor, QColor, QTextCharFormat
 import platform
 
+@functools.lru_cache(maxsize=None)
+def _system_info():
+    """获取系统信息（进程内只计算一次）"""
+    return {
+        "Platform": platform.platform(),
+        "Python Version": sys.version.split()[0],
+        "Architecture": platform.architecture()[0],
+        "Processor": platform.processor(),
+        "Machine": platform.machine(),
+        "Node": platform.node(),
+        "System": platform.system(),
+        "Release": platform.release(),
+        "Version": platform.version()
+    }
+
 class LogHandler(logging.Handler):
     """自定义日志处理器，将日志发送到队列"""
     def __init__(self, log_queue):
@@ -38,6 +54,7 @@ class LogHandler(logging.Handler):
         log_entry = {
             'timestamp': datetime.fromtimestamp(record.created),
             'level': record.levelname,
+            'levelno': record.levelno,
             'logger': record.name,
             'message': record.getMessage(),
             'module': record.module,
@@ -52,24 +69,44 @@ class LogHandler(logging.Handler):
             pass  # 如果队列满了，丢弃日志
 
 class LogMonitorThread(QThread):
-    """日志监控线程"""
-    log_received = pyqtSignal(dict)
+    """日志监控线程，按批次将日志投递到GUI线程"""
+    BATCH_SIZE = 200
+    BATCH_INTERVAL = 0.05
     
-    def __init__(self, log_queue):
+    def __init__(self, log_queue, receiver):
         super().__init__()
         self.log_queue = log_queue
+        self.receiver = receiver
         self.running = True
         
     def run(self):
+        batch = []
+        deadline = 0.0
         while self.running:
             try:
-                # 非阻塞获取日志
-                log_entry = self.log_queue.get(timeout=0.1)
-                self.log_received.emit(log_entry)
+                # 空闲时最多等待0.1秒，攒批时等到批次截止时间
+                timeout = max(0.0, deadline - time.monotonic()) if batch else 0.1
+                log_entry = self.log_queue.get(timeout=timeout)
+                if not batch:
+                    deadline = time.monotonic() + self.BATCH_INTERVAL
+                batch.append(log_entry)
+                if len(batch) < self.BATCH_SIZE:
+                    continue
             except queue.Empty:
-                continue
+                if not batch:
+                    continue
             except Exception as e:
                 print(f"Log monitor error: {e}")
+                continue
+            self.dispatch(batch)
+            batch = []
+        if batch:
+            self.dispatch(batch)
+                
+    def dispatch(self, batch):
+        """每个批次只向GUI事件队列投递一个事件"""
+        QMetaObject.invokeMethod(self.receiver, "_drain_batch", Qt.QueuedConnection,
+                                 Q_ARG(list, batch))
                 
     def stop(self):
         self.running = False
@@ -85,8 +122,16 @@ class YRDebugConsole(QWidget):
         self.monitor_thread = None
         self.log_levels = ['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL']
         self.current_level = 'DEBUG'
+        self.min_levelno = getattr(logging, self.current_level)
         self.auto_scroll = True
         self.max_lines = 1000
+        self.level_index = {level: i for i, level in enumerate(self.log_levels)}
+        self.stat_counts = [0] * len(self.log_levels)
+        self.level_formats = {}
+        for level in self.log_levels:
+            char_format = QTextCharFormat()
+            char_format.setForeground(QColor(self.get_level_color(level)))
+            self.level_formats[level] = char_format
         
         self.setup_logging()
         self.init_ui()
@@ -212,19 +257,7 @@ class YRDebugConsole(QWidget):
         system_layout = QFormLayout(system_group)
         
         # 系统信息
-        system_info = {
-            "Platform": platform.platform(),
-            "Python Version": sys.version.split()[0],
-            "Architecture": platform.architecture()[0],
-            "Processor": platform.processor(),
-            "Machine": platform.machine(),
-            "Node": platform.node(),
-            "System": platform.system(),
-            "Release": platform.release(),
-            "Version": platform.version()
-        }
-        
-        for key, value in system_info.items():
+        for key, value in _system_info().items():
             label = QLabel(str(value))
             label.setWordWrap(True)
             system_layout.addRow(f"{key}:", label)
@@ -264,43 +297,48 @@ class YRDebugConsole(QWidget):
         
     def start_monitoring(self):
         """开始监控日志"""
-        self.monitor_thread = LogMonitorThread(self.log_queue)
-        self.monitor_thread.log_received.connect(self.on_log_received)
+        self.monitor_thread = LogMonitorThread(self.log_queue, self)
         self.monitor_thread.start()
         
         # 添加启动消息
         self.add_log_message("YR Debug Console started", "INFO")
         
-    def on_log_received(self, log_entry):
-        """处理接收到的日志"""
-        level = log_entry['level']
-        
-        # 检查日志级别过滤
-        if self.log_levels.index(level) < self.log_levels.index(self.current_level):
-            return
+    @pyqtSlot(list)
+    def _drain_batch(self, batch):
+        """处理一个批次的日志"""
+        messages = []
+        for log_entry in batch:
+            level = log_entry['level']
             
-        # 格式化日志消息
-        timestamp = log_entry['timestamp'].strftime("%H:%M:%S.%f")[:-3]
-        message = f"[{timestamp}] [{level}] {log_entry['logger']}.{log_entry['funcName']}:{log_entry['lineno']} - {log_entry['message']}"
-        
-        # 添加颜色格式
-        self.add_colored_log(message, level)
-        
-        # 更新统计
-        self.update_stats(level)
+            # 检查日志级别过滤
+            if log_entry['levelno'] < self.min_levelno:
+                continue
+                
+            # 格式化日志消息
+            timestamp = log_entry['timestamp'].strftime("%H:%M:%S.%f")[:-3]
+            messages.append((f"[{timestamp}] [{level}] {log_entry['logger']}.{log_entry['funcName']}:{log_entry['lineno']} - {log_entry['message']}", level))
+            
+            # 更新统计
+            self.count_log(level)
+            
+        if messages:
+            self.add_colored_logs(messages)
+            self.update_stats()
         
     def add_colored_log(self, message, level):
         """添加带颜色的日志"""
+        self.add_colored_logs([(message, level)])
+        
+    def add_colored_logs(self, messages):
+        """批量添加带颜色的日志，行数限制和滚动每批只处理一次"""
         cursor = self.log_text.textCursor()
         cursor.movePosition(QTextCursor.End)
-        
-        # 设置颜色格式
-        char_format = QTextCharFormat()
-        char_format.setForeground(QColor(self.get_level_color(level)))
-        cursor.setCharFormat(char_format)
+        cursor.beginEditBlock()
         
         # 插入文本
-        cursor.insertText(message + "\n")
+        for message, level in messages:
+            cursor.setCharFormat(self.level_formats.get(level, QTextCharFormat()))
+            cursor.insertText(message + "\n")
         
         # 限制最大行数
         if self.log_text.document().blockCount() > self.max_lines:
@@ -308,6 +346,7 @@ class YRDebugConsole(QWidget):
             cursor.movePosition(QTextCursor.Down, QTextCursor.KeepAnchor, 
                               self.log_text.document().blockCount() - self.max_lines)
             cursor.removeSelectedText()
+        cursor.endEditBlock()
             
         # 自动滚动
         if self.auto_scroll:
@@ -330,11 +369,16 @@ class YRDebugConsole(QWidget):
         }
         return colors.get(level, '#f8f8f2')
         
-    def update_stats(self, level):
-        """更新日志统计"""
-        if level in self.stats_labels:
-            current_count = int(self.stats_labels[level].text())
-            self.stats_labels[level].setText(str(current_count + 1))
+    def count_log(self, level):
+        """累加日志计数（不触碰界面）"""
+        index = self.level_index.get(level)
+        if index is not None:
+            self.stat_counts[index] += 1
+            
+    def update_stats(self):
+        """将日志计数同步到统计标签"""
+        for level, index in self.level_index.items():
+            self.stats_labels[level].setText(str(self.stat_counts[index]))
             
     def update_memory_info(self):
         """更新内存使用信息"""
@@ -359,6 +403,7 @@ Memory %: {memory_percent:.1f}%
     def on_level_changed(self, level):
         """日志级别改变"""
         self.current_level = level
+        self.min_levelno = getattr(logging, level)
         
     def on_max_lines_changed(self, value):
         """最大行数改变"""
@@ -368,8 +413,8 @@ Memory %: {memory_percent:.1f}%
         """清除日志"""
         self.log_text.clear()
         # 重置统计
-        for label in self.stats_labels.values():
-            label.setText("0")
+        self.stat_counts = [0] * len(self.log_levels)
+        self.update_stats()
         self.add_log_message("Logs cleared", "INFO")
         
     def toggle_pause(self):
@@ -380,8 +425,7 @@ Memory %: {memory_percent:.1f}%
                 self.pause_btn.setText("Resume")
                 self.add_log_message("Log monitoring paused", "WARNING")
             else:
-                self.monitor_thread = LogMonitorThread(self.log_queue)
-                self.monitor_thread.log_received.connect(self.on_log_received)
+                self.monitor_thread = LogMonitorThread(self.log_queue, self)
                 self.monitor_thread.start()
                 self.pause_btn.setText("Pause")
                 self.add_log_message("Log monitoring resumed", "INFO")
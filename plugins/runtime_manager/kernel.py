@@ -18,13 +18,85 @@ import os
 import sys
 import json
 import shutil
+import logging
+import mmap
+import functools
+import itertools
+import subprocess
+import threading
+import uuid
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QFormLayout, QLabel, 
                             QTreeWidget, QTreeWidgetItem, QPushButton, QDialog, 
                             QDialogButtonBox, QLineEdit, QFileDialog, QMessageBox, 
-                            QScrollArea, QMenu, QInputDialog, QRadioButton)
-from PyQt5.QtCore import Qt, QSize
+                            QScrollArea, QMenu, QInputDialog, QRadioButton, QProgressDialog,
+                            QApplication)
+from PyQt5.QtCore import Qt, QSize, QObject, QThread, QTimer, pyqtSignal, pyqtSlot
 from PyQt5.QtGui import QIcon, QFont, QCursor
 
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def _dumps(obj):
+    """Serialize to indented UTF-8 JSON bytes, using orjson when it is installed"""
+    if orjson is not None:
+        # OPT_NON_STR_KEYS mirrors json.dumps, which coerces non-string keys
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, indent=2, ensure_ascii=False).encode('utf-8')
+
+# files at least this large are memory-mapped instead of read when orjson can parse the mapping
+_MMAP_THRESHOLD = 64 * 1024
+
+def _load_json_file(path, size):
+    """Parse a JSON file (with orjson when installed); large files are parsed straight from an mmap"""
+    with open(path, 'rb') as f:
+        if orjson is None:
+            return json.loads(f.read())
+        if size < _MMAP_THRESHOLD:
+            return orjson.loads(f.read())
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            with memoryview(mm) as view:
+                return orjson.loads(view)
+
+@functools.lru_cache(maxsize=None)
+def _which(cmd):
+    return shutil.which(cmd)
+
+@functools.lru_cache(maxsize=4096)
+def _npkey(p):
+    """Case- and separator-insensitive comparison key for a path; memoized since sys.path/PATH entries recur"""
+    return os.path.normcase(os.path.normpath(p))
+
+def _fast_copytree(src, dst):
+    """
+    Copy a directory tree with a native tool when one is available.
+    robocopy (Windows) and cp (POSIX) copy the whole tree in one process, which is much
+    faster than shutil.copytree for modules made of thousands of small files.
+    """
+    if os.name == 'nt' and _which('robocopy'):
+        result = subprocess.run(
+            ['robocopy', src, dst, '/E', '/MT:16', '/NFL', '/NDL', '/NJH', '/NJS', '/NP', '/SL'],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            creationflags=getattr(subprocess, 'CREATE_NO_WINDOW', 0)
+        )
+        # robocopy exit codes 0-3 mean success (with or without files copied)
+        if result.returncode > 3:
+            raise OSError(f"robocopy failed with exit code {result.returncode}")
+    elif os.name != 'nt' and _which('cp'):
+        os.makedirs(dst, exist_ok=True)
+        result = subprocess.run(['cp', '-a', os.path.join(src, '.'), dst],
+                                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        if result.returncode != 0:
+            raise OSError(f"cp failed: {result.stderr.decode(errors='replace').strip()}")
+    else:
+        # Timestamps are not needed in the runtime copy; skip copystat. POSIX keeps the
+        # permission bits (shutil.copy) so binaries in common modules stay executable.
+        copy_function = shutil.copyfile if os.name == 'nt' else shutil.copy
+        shutil.copytree(src, dst, copy_function=copy_function, dirs_exist_ok=True)
+
 class ModuleEditor(QDialog):
     def __init__(self, parent=None, edit_mode=False, module_data=None):
         super().__init__(parent)
@@ -121,18 +193,42 @@ class ModuleEditor(QDialog):
             'type': 'package' if self.package_radio.isChecked() else 'common'
         }
     
-    def copy_module_to_runtime(self, source_path, environment_name, module_name):
+    @staticmethod
+    def copy_module_to_runtime(source_path, environment_name, module_name):
         try:
             runtime_base = os.path.join(os.getcwd(), 'runtime')
             env_dir = os.path.join(runtime_base, environment_name)
             target_dir = os.path.join(env_dir, module_name)
             
+            # Re-adding a module from its own runtime folder: nothing to copy
+            if os.path.normcase(os.path.abspath(source_path)) == os.path.normcase(os.path.abspath(target_dir)):
+                return os.path.relpath(target_dir, os.getcwd())
+            
             os.makedirs(env_dir, exist_ok=True)
             
-            if os.path.exists(target_dir):
-                shutil.rmtree(target_dir)
+            # Move an existing copy aside instead of deleting it first, so the user only
+            # waits for the copy; the old tree is removed in the background afterwards.
+            # The backup goes to runtime/.trash (same filesystem, never scanned as an env),
+            # so a cleanup cut short by exiting the app cannot shadow the new copy.
+            trash_dir = os.path.join(runtime_base, '.trash')
+            os.makedirs(trash_dir, exist_ok=True)
+            backup_dir = os.path.join(trash_dir, uuid.uuid4().hex)
+            try:
+                os.rename(target_dir, backup_dir)
+            except FileNotFoundError:
+                backup_dir = None
             
-            shutil.copytree(source_path, target_dir)
+            try:
+                _fast_copytree(source_path, target_dir)
+            except Exception:
+                shutil.rmtree(target_dir, ignore_errors=True)
+                if backup_dir:
+                    os.rename(backup_dir, target_dir)
+                raise
+            
+            if backup_dir:
+                threading.Thread(target=shutil.rmtree, args=(backup_dir,),
+                                 kwargs={'ignore_errors': True}, daemon=True).start()
             
             relative_path = os.path.relpath(target_dir, os.getcwd())
             return relative_path
@@ -160,79 +256,134 @@ class ModuleEditor(QDialog):
         if self.validate_data():
             super().accept()
 
+class CopyProgressDialog(QProgressDialog):
+    """Busy dialog for a module copy; Escape and the title-bar close button cannot dismiss it"""
+    def reject(self):
+        pass
+    
+    def closeEvent(self, event):
+        if event.spontaneous():
+            event.ignore()
+        else:
+            super().closeEvent(event)
+
+class CopyWorker(QObject):
+    """Copies a module into the runtime directory on a background thread"""
+    finished = pyqtSignal(str)
+    failed = pyqtSignal(str)
+    
+    def __init__(self, source_path, environment_name, module_name):
+        super().__init__()
+        self.source_path = source_path
+        self.environment_name = environment_name
+        self.module_name = module_name
+    
+    @pyqtSlot()
+    def run(self):
+        new_path = ModuleEditor.copy_module_to_runtime(self.source_path, self.environment_name, self.module_name)
+        if new_path:
+            self.finished.emit(new_path)
+        else:
+            self.failed.emit("Failed to copy module to runtime directory.")
+
 class RuntimeManagerPlugin(QWidget):
-    def __init__(self):
+    # QIcon per icon path, shared by all instances so each SVG is decoded once
+    _ICON_CACHE = {}
+    _PRELOADED_ICONS = (
+        "./icons/package.svg", "./icons/folder.svg", "./icons/folder_activated.svg",
+        "./icons/runtime.svg", "./icons/runtime_base.svg", "./icons/edit.svg",
+        "./icons/delete.svg", "./icons/metro_transfer.svg", "./icons/activate.svg",
+        "./icons/deactivate.svg", "./icons/metro_add.svg"
+    )
+    
+    def __init__(self, plugin_path=None):
         super().__init__()
+        self.plugin_path = plugin_path or os.path.dirname(os.path.abspath(__file__))
+        for icon_path in self._PRELOADED_ICONS:
+            self._icon(icon_path)
+        # icons used for every tree row, bound once
+        self._package_icon = self._icon("./icons/package.svg")
+        self._folder_icon = self._icon("./icons/folder.svg")
+        self._folder_active_icon = self._icon("./icons/folder_activated.svg")
+        base_icon = os.path.join(self.plugin_path, "icon.svg")
+        if os.path.exists(base_icon):
+            self._base_icon = self._icon(base_icon)
+        else:
+            self._base_icon = self._icon("./icons/runtime_base.svg")
+        self._copy_job = None  # the module copy currently running in the background
+        self._env_items = {}  # custom environment name -> its tree item
+        self._cwd = os.getcwd()
+        self._runtime_base = os.path.join(self._cwd, 'runtime')
+        self._env_file = os.path.join(self._cwd, 'plugins', 'runtime_manager', 'environments.json')
+        self._env_dir = os.path.dirname(self._env_file)
+        self._env_dirty = False  # environments changed since the last save
+        self._save_dir_ready = False  # environments.json's directory has been created
+        # coalesce bursts of changes into one write
+        self._save_timer = QTimer(self)
+        self._save_timer.setSingleShot(True)
+        self._save_timer.setInterval(250)
+        self._save_timer.timeout.connect(self._flush_save)
+        app = QApplication.instance()
+        if app is not None:
+            app.aboutToQuit.connect(self._flush_save)
         self.environments = {
             'base': {},  # base environment
             'custom': {}  # custom environment
         }
         self.activated_environments = set()  # trace activated environments
         self.load_environments()
+        self._empty_trash()
         self.init_env()  # scan and initialize activated environments
         self.init_ui()
     
+    def _empty_trash(self):
+        """Remove module copies left in runtime/.trash when an earlier session exited mid-cleanup"""
+        try:
+            with os.scandir(os.path.join(self._runtime_base, '.trash')) as it:
+                leftovers = [entry.path for entry in it]
+        except OSError:
+            return
+        if leftovers:
+            # only the entries listed now, so backups made by later copies are left alone
+            def remove_leftovers():
+                for path in leftovers:
+                    shutil.rmtree(path, ignore_errors=True)
+            threading.Thread(target=remove_leftovers, daemon=True).start()
+    
     def init_env(self):
         """
         When YR Runtime Manager is closed abruptly, activated environments will be remained in sys.path and PATH.
         Thus, we need to scan both sys.path and PATH environment variable to initialize activated environments.
         """
-        runtime_base = os.path.join(os.getcwd(), 'runtime')
-        for path in sys.path:
-            if path.startswith(runtime_base):
-                rel_path = os.path.relpath(path, runtime_base)
-                path_parts = rel_path.split(os.sep)
-                
-                if len(path_parts) >= 1 and path_parts[0] != '.':
-                    env_name = path_parts[0]
-                    self.activated_environments.add(env_name)
-                    print(f"Detected activated environment from sys.path: {env_name}")
-
-            elif path.startswith('runtime'):
-                rel_path = os.path.relpath(path, 'runtime')
-                path_parts = rel_path.split(os.sep)
-                
-                if len(path_parts) >= 1 and path_parts[0] != '.':
-                    env_name = path_parts[0]
-                    self.activated_environments.add(env_name)
-                    print(f"Detected activated environment from sys.path (relative): {env_name}")
-        
-        current_path = os.environ.get('PATH', '')
-        for path in current_path.split(os.pathsep):
-            if path.startswith(runtime_base):
-                rel_path = os.path.relpath(path, runtime_base)
-                path_parts = rel_path.split(os.sep)
-                
-                if len(path_parts) >= 1 and path_parts[0] != '.':
-                    env_name = path_parts[0]
-                    self.activated_environments.add(env_name)
-                    print(f"Detected activated environment from PATH: {env_name}")
-
-            elif path.startswith('runtime'):
-                rel_path = os.path.relpath(path, 'runtime')
-                path_parts = rel_path.split(os.sep)
-                
-                if len(path_parts) >= 1 and path_parts[0] != '.':
-                    env_name = path_parts[0]
-                    self.activated_environments.add(env_name)
-                    print(f"Detected activated environment from PATH (relative): {env_name}")
+        runtime_base = os.path.abspath(self._runtime_base)
+        runtime_prefix = runtime_base + os.sep
+        
+        # sys.path and PATH may hold absolute or cwd-relative runtime paths; abspath covers both
+        activated = set()
+        for path in itertools.chain(sys.path, os.environ.get('PATH', '').split(os.pathsep)):
+            if not path:
+                continue
+            abs_path = os.path.abspath(path)
+            if abs_path.startswith(runtime_prefix):
+                activated.add(abs_path[len(runtime_prefix):].split(os.sep, 1)[0])
+        self.activated_environments.update(activated)
         
         # base environment should also be checked
         base_env_path = os.path.join(runtime_base, 'base')
-        if os.path.exists(base_env_path):
-            has_modules = False
-            for item in os.listdir(base_env_path):
-                item_path = os.path.join(base_env_path, item)
-                if os.path.isdir(item_path):
-                    has_modules = True
-                    break
-            
-            if has_modules:
-                self.activated_environments.add('base')
-                print(f"Detected base environment with modules")
+        has_modules = False
+        try:
+            # any() stops at the first module directory
+            with os.scandir(base_env_path) as it:
+                has_modules = any(entry.is_dir(follow_symlinks=False) for entry in it)
+        except FileNotFoundError:
+            pass
+        
+        if has_modules:
+            self.activated_environments.add('base')
         
         if self.activated_environments:
-            print(f"Found {len(self.activated_environments)} activated environments: {', '.join(self.activated_environments)}")
+            logger.info("Found %d activated environments: %s",
+                        len(self.activated_environments), ', '.join(self.activated_environments))
     
     def init_ui(self):
         main_layout = QHBoxLayout()
@@ -270,6 +421,8 @@ class RuntimeManagerPlugin(QWidget):
         self.tree.setContextMenuPolicy(Qt.CustomContextMenu)
         self.tree.customContextMenuRequested.connect(self.show_context_menu)
         self.tree.itemDoubleClicked.connect(self.on_item_double_clicked)
+        self.tree.itemExpanded.connect(self._on_item_expanded)
+        self.init_context_menus()
         
         self.refresh_tree()
         layout.addWidget(self.tree)
@@ -278,70 +431,130 @@ class RuntimeManagerPlugin(QWidget):
         main_layout.addWidget(widget)
         self.setLayout(main_layout)
     
+    def _icon(self, path):
+        icon = self._ICON_CACHE.get(path)
+        if icon is None:
+            icon = QIcon(path)
+            self._ICON_CACHE[path] = icon
+        return icon
+    
+    def _mark_dirty(self):
+        """Record that environments changed; the file is written once the burst settles"""
+        self._env_dirty = True
+        self._save_timer.start()
+    
+    def _flush_save(self):
+        self._save_timer.stop()
+        if self._env_dirty:
+            self.save_environments()
+    
     def refresh_tree(self):
-        self.tree.clear()
-        
-        # create base environment node
-        base_root = QTreeWidgetItem()
-        base_root.setText(0, "Base Environment (base)")
+        # build the whole tree without intermediate repaints or signals
+        self.tree.setUpdatesEnabled(False)
+        self.tree.blockSignals(True)
         try:
-            base_icon = os.path.join(self.plugin_path, "icon.svg")
-            base_root.setIcon(0, QIcon(base_icon))
-        except:
-            base_root.setIcon(0, QIcon("./icons/runtime_base.svg"))
-        base_root.setFlags(base_root.flags() | Qt.ItemIsEnabled)
-        base_root.setChildIndicatorPolicy(QTreeWidgetItem.ShowIndicator)
-        base_root.environment_name = 'base'
-        
-        # add modules in base environment
-        for module_name, module_data in self.environments['base'].items():
-            item = QTreeWidgetItem()
-            item.setText(0, f"{module_data['name']} v{module_data['version']}")
-            item.setIcon(0, QIcon("./icons/package.svg"))
-            item.module_name = module_name
-            item.module_data = module_data
-            item.environment_name = 'base'
-            base_root.addChild(item)
-        
-        # create custom environment node
-        custom_root = QTreeWidgetItem()
-        custom_root.setText(0, "Custom Environment")
-        custom_root.setIcon(0, QIcon("./icons/runtime.svg"))
-        custom_root.setFlags(custom_root.flags() | Qt.ItemIsEnabled)
-        custom_root.setChildIndicatorPolicy(QTreeWidgetItem.ShowIndicator)
-        custom_root.environment_name = 'custom'
-        
-        # add custom environment
-        for env_name, modules in self.environments['custom'].items():
-            env_item = QTreeWidgetItem()
-            env_item.setText(0, env_name)
-            if env_name in self.activated_environments:
-                env_item.setIcon(0, QIcon("./icons/folder_activated.svg"))
-            else:
-                env_item.setIcon(0, QIcon("./icons/folder.svg"))
-            env_item.environment_name = 'custom'
-            env_item.env_name = env_name
-            
-            for module_name, module_data in modules.items():
-                module_item = QTreeWidgetItem()
-                module_item.setText(0, f"{module_data['name']} v{module_data['version']}")
-                module_item.setIcon(0, QIcon("./icons/package.svg"))
-                module_item.module_name = module_name
-                module_item.module_data = module_data
-                module_item.environment_name = 'custom'
-                module_item.env_name = env_name
-                env_item.addChild(module_item)
-            
-            custom_root.addChild(env_item)
-        
-        self.tree.addTopLevelItem(base_root)
-        self.tree.addTopLevelItem(custom_root)
-        
-        # self.tree.expandToDepth(2)
+            self.tree.clear()
+        
+            # create base environment node
+            base_root = QTreeWidgetItem()
+            base_root.setText(0, "Base Environment (base)")
+            base_root.setIcon(0, self._base_icon)
+            base_root.setFlags(base_root.flags() | Qt.ItemIsEnabled)
+            base_root.setChildIndicatorPolicy(QTreeWidgetItem.ShowIndicator)
+            base_root.environment_name = 'base'
+        
+            # add modules in base environment
+            base_root.addChildren([self._build_module_item(module_name, module_data, 'base')
+                                   for module_name, module_data in self.environments['base'].items()])
+        
+            # create custom environment node
+            custom_root = QTreeWidgetItem()
+            custom_root.setText(0, "Custom Environment")
+            custom_root.setIcon(0, self._icon("./icons/runtime.svg"))
+            custom_root.setFlags(custom_root.flags() | Qt.ItemIsEnabled)
+            custom_root.setChildIndicatorPolicy(QTreeWidgetItem.ShowIndicator)
+            custom_root.environment_name = 'custom'
+        
+            # add custom environment
+            self._env_items = {}
+            custom_root.addChildren([self._build_env_item(env_name)
+                                     for env_name in self.environments['custom']])
+        
+            self._base_root = base_root
+            self._custom_root = custom_root
+            self.tree.addTopLevelItem(base_root)
+            self.tree.addTopLevelItem(custom_root)
+        
+            # self.tree.expandToDepth(2)
 
-        # expand custom environment
-        custom_root.setExpanded(True)
-        base_root.setExpanded(True)
+            # expand custom environment
+            custom_root.setExpanded(True)
+            base_root.setExpanded(True)
+        finally:
+            self.tree.blockSignals(False)
+            self.tree.setUpdatesEnabled(True)
+            self.tree.viewport().update()
+    
+    def _build_module_item(self, module_name, module_data, environment_name, env_name=None):
+        item = QTreeWidgetItem()
+        item.setText(0, f"{module_data['name']} v{module_data['version']}")
+        item.setIcon(0, self._package_icon)
+        item.module_name = module_name
+        item.module_data = module_data
+        item.environment_name = environment_name
+        if env_name is not None:
+            item.env_name = env_name
+        return item
+    
+    def _build_env_item(self, env_name):
+        env_item = QTreeWidgetItem()
+        env_item.setText(0, env_name)
+        env_item.environment_name = 'custom'
+        env_item.env_name = env_name
+        self._update_env_icon(env_item)
+        # module rows are built on first expand (see _on_item_expanded)
+        env_item.setChildIndicatorPolicy(QTreeWidgetItem.ShowIndicator)
+        env_item._populated = False
+        self._env_items[env_name] = env_item
+        return env_item
+    
+    def _populate_env_item(self, env_item):
+        if env_item._populated:
+            return
+        env_item._populated = True
+        env_name = env_item.env_name
+        modules = self.environments['custom'].get(env_name, {})
+        env_item.addChildren([self._build_module_item(module_name, module_data, 'custom', env_name)
+                              for module_name, module_data in modules.items()])
+        env_item.setChildIndicatorPolicy(QTreeWidgetItem.DontShowIndicatorWhenChildless)
+    
+    def _on_item_expanded(self, item):
+        if getattr(item, '_populated', True) is False:
+            self._populate_env_item(item)
+    
+    def _update_env_icon(self, env_item):
+        if env_item.env_name in self.activated_environments:
+            env_item.setIcon(0, self._folder_active_icon)
+        else:
+            env_item.setIcon(0, self._folder_icon)
+    
+    def _env_parent_item(self, env_name):
+        """Tree item that holds the modules of an environment ('base' or a custom env name)"""
+        return self._base_root if env_name == 'base' else self._env_items[env_name]
+    
+    def _place_module_item(self, env_name, module_name, module_data):
+        """Add a module row under its environment, replacing an existing row with the same name"""
+        parent = self._env_parent_item(env_name)
+        if getattr(parent, '_populated', True) is False:
+            return  # built from self.environments when the env is first expanded
+        for i in range(parent.childCount()):
+            if getattr(parent.child(i), 'module_name', None) == module_name:
+                parent.removeChild(parent.child(i))
+                break
+        if env_name == 'base':
+            parent.addChild(self._build_module_item(module_name, module_data, 'base'))
+        else:
+            parent.addChild(self._build_module_item(module_name, module_data, 'custom', env_name))
     
     def add_environment(self):
         name, ok = QInputDialog.getText(self, "Add Environment", "Please enter the environment name:")
@@ -349,8 +562,8 @@ class RuntimeManagerPlugin(QWidget):
             env_name = name.strip()
             if env_name not in self.environments['custom']:
                 self.environments['custom'][env_name] = {}
-                self.save_environments()
-                self.refresh_tree()
+                self._mark_dirty()
+                self._custom_root.addChild(self._build_env_item(env_name))
             else:
                 QMessageBox.warning(self, "Error", "Environment name already exists")
     
@@ -363,7 +576,6 @@ class RuntimeManagerPlugin(QWidget):
         if editor.exec_() == QDialog.Accepted:
             module_data = editor.get_module_data()
             module_name = module_data['name']
-            source_path = module_data['path']
             
             if module_name in self.environments[env_name]:
                 reply = QMessageBox.question(
@@ -374,15 +586,64 @@ class RuntimeManagerPlugin(QWidget):
                 if reply != QMessageBox.Yes:
                     return
             
-            new_path = editor.copy_module_to_runtime(source_path, env_name, module_name)
-            if new_path:
-                module_data['path'] = new_path
-                self.environments[env_name][module_name] = module_data
-                self.save_environments()
-                self.refresh_tree()
-                QMessageBox.information(self, "Success", f"Module '{module_name}' has been copied to runtime environment.")
-            else:
-                QMessageBox.warning(self, "Error", "Failed to copy module to runtime directory.")
+            self.start_module_copy(self.environments[env_name], env_name, module_data)
+    
+    def start_module_copy(self, modules, env_name, module_data):
+        """Copy a module on a worker thread; modules is the dict the module will be registered in"""
+        if self._copy_job is not None:
+            # the pending state is tracked for one copy at a time
+            QMessageBox.warning(self, "Busy", "Another module is still being copied, please wait until it finishes.")
+            return
+        module_name = module_data['name']
+        
+        progress = CopyProgressDialog(f"Copying module '{module_name}' to runtime environment...", None, 0, 0, self)
+        progress.setWindowTitle("Adding Module")
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(0)
+        progress.show()
+        self.add_module_btn.setEnabled(False)
+        
+        thread = QThread(self)
+        worker = CopyWorker(module_data['path'], env_name, module_name)
+        worker.moveToThread(thread)
+        thread.started.connect(worker.run)
+        worker.finished.connect(self.on_module_copied)
+        worker.failed.connect(self.on_module_copy_failed)
+        worker.finished.connect(thread.quit)
+        worker.failed.connect(thread.quit)
+        thread.finished.connect(worker.deleteLater)
+        thread.finished.connect(thread.deleteLater)
+        
+        self._copy_job = (modules, env_name, module_data, thread, worker, progress)
+        thread.start()
+    
+    def _end_module_copy(self):
+        modules, env_name, module_data, _, _, progress = self._copy_job
+        self._copy_job = None
+        progress.close()
+        self.add_module_btn.setEnabled(True)
+        return modules, env_name, module_data
+    
+    def _is_copy_target(self, env_name):
+        return self._copy_job is not None and self._copy_job[1] == env_name
+    
+    def on_module_copied(self, new_path):
+        modules, env_name, module_data = self._end_module_copy()
+        module_name = module_data['name']
+        if env_name != 'base' and self.environments['custom'].get(env_name) is not modules:
+            # the target environment was renamed or deleted while copying
+            QMessageBox.warning(self, "Error",
+                                f"Environment '{env_name}' no longer exists, module '{module_name}' was not added.")
+            return
+        module_data['path'] = new_path
+        modules[module_name] = module_data
+        self._mark_dirty()
+        self._place_module_item(env_name, module_name, module_data)
+        QMessageBox.information(self, "Success", f"Module '{module_name}' has been copied to runtime environment.")
+    
+    def on_module_copy_failed(self, message):
+        self._end_module_copy()
+        QMessageBox.warning(self, "Error", message)
     
     def select_environment(self):
         dialog = QDialog(self)
@@ -421,41 +682,55 @@ class RuntimeManagerPlugin(QWidget):
                 return current_item.data(0, Qt.UserRole)
         return None
     
+    def init_context_menus(self):
+        """Build the context menus once; their actions act on self._ctx_item"""
+        self._ctx_item = None
+        
+        # module project
+        self._module_menu = QMenu(self)
+        self._module_menu.addAction(self._icon("./icons/edit.svg"), "Edit",
+                                    lambda: self.edit_module(self._ctx_item))
+        self._module_menu.addAction(self._icon("./icons/metro_transfer.svg"), "Move to...",
+                                    lambda: self.move_module(self._ctx_item))
+        self._module_menu.addAction(self._icon("./icons/delete.svg"), "Delete Module",
+                                    lambda: self.delete_module(self._ctx_item))
+        
+        # custom environment project, one menu per activation state
+        self._env_active_menu = QMenu(self)
+        self._env_active_menu.addAction(self._icon("./icons/deactivate.svg"), "Deactivate",
+                                        lambda: self.deactivate_environment(self._ctx_item))
+        self._env_inactive_menu = QMenu(self)
+        self._env_inactive_menu.addAction(self._icon("./icons/activate.svg"), "Activate",
+                                          lambda: self.activate_environment(self._ctx_item))
+        # custom environment root
+        self._custom_root_menu = QMenu(self)
+        self._custom_root_menu.addAction(self._icon("./icons/deactivate.svg"), "Deactivate All",
+                                         self.deactivate_all)
+        for menu in (self._env_active_menu, self._env_inactive_menu):
+            menu.addAction(self._icon("./icons/metro_add.svg"), "Add Module",
+                           lambda: self.add_module_to_env(self._ctx_item.env_name))
+            menu.addAction(self._icon("./icons/edit.svg"), "Rename",
+                           lambda: self.rename_environment(self._ctx_item))
+            menu.addAction(self._icon("./icons/delete.svg"), "Delete",
+                           lambda: self.delete_environment(self._ctx_item))
+    
     def show_context_menu(self, pos):
         item = self.tree.itemAt(pos)
         if not item:
             return
         
-        menu = QMenu()
-        
         if hasattr(item, 'module_name'):  # module project
-            edit_action = menu.addAction(QIcon("./icons/edit.svg"), "Edit")
-            edit_action.triggered.connect(lambda: self.edit_module(item))
-            
-            move_action = menu.addAction(QIcon("./icons/metro_transfer.svg"), "Move to...")
-            move_action.triggered.connect(lambda: self.move_module(item))
-            
-            delete_action = menu.addAction(QIcon("./icons/delete.svg"), "Delete Module")
-            delete_action.triggered.connect(lambda: self.delete_module(item))
-            
+            menu = self._module_menu
         elif hasattr(item, 'env_name'):  # custom environment project
             if item.env_name in self.activated_environments:
-                deactivate_action = menu.addAction(QIcon("./icons/deactivate.svg"), "Deactivate")
-                deactivate_action.triggered.connect(lambda: self.deactivate_environment(item))
+                menu = self._env_active_menu
             else:
-                activate_action = menu.addAction(QIcon("./icons/activate.svg"), "Activate")
-                activate_action.triggered.connect(lambda: self.activate_environment(item))
-
-            add_module_action = menu.addAction(QIcon("./icons/metro_add.svg"), "Add Module")
-            add_module_action.triggered.connect(lambda: self.add_module_to_env(item.env_name))
-            
-            rename_action = menu.addAction(QIcon("./icons/edit.svg"), "Rename")
-            rename_action.triggered.connect(lambda: self.rename_environment(item)) 
-            
-            delete_env_action = menu.addAction(QIcon("./icons/delete.svg"), "Delete")
-            delete_env_action.triggered.connect(lambda: self.delete_environment(item))
-
-
+                menu = self._env_inactive_menu
+        elif item is self._custom_root and self._activated_custom_envs():
+            menu = self._custom_root_menu
+        else:
+            return
+        self._ctx_item = item
         
         # fix menu position: use cursor position for accurate placement
         # This works better when the widget is embedded in other containers
@@ -471,15 +746,25 @@ class RuntimeManagerPlugin(QWidget):
         if editor.exec_() == QDialog.Accepted:
             new_data = editor.get_module_data()
             old_name = item.module_name
+            if item.environment_name == 'base':
+                modules = self.environments['base']
+            else:
+                modules = self.environments['custom'][item.env_name]
             
             if new_data['name'] != old_name:
-                del self.environments[item.environment_name][old_name]
-                self.environments[item.environment_name][new_data['name']] = new_data
+                if new_data['name'] in modules:
+                    QMessageBox.warning(self, "Module Already Exists",
+                                        f"Module '{new_data['name']}' already exists in this environment.")
+                    return
+                del modules[old_name]
+                modules[new_data['name']] = new_data
             else:
-                self.environments[item.environment_name][old_name] = new_data
+                modules[old_name] = new_data
             
-            self.save_environments()
-            self.refresh_tree()
+            self._mark_dirty()
+            item.setText(0, f"{new_data['name']} v{new_data['version']}")
+            item.module_name = new_data['name']
+            item.module_data = new_data
     
     def move_module(self, item):
         target_env = self.select_environment()
@@ -499,8 +784,9 @@ class RuntimeManagerPlugin(QWidget):
         else:
             self.environments['custom'][target_env][module_name] = module_data
         
-        self.save_environments()
-        self.refresh_tree()
+        self._mark_dirty()
+        item.parent().removeChild(item)
+        self._place_module_item(target_env, module_name, module_data)
     
     def delete_module(self, item):
         reply = QMessageBox.question(
@@ -525,15 +811,14 @@ class RuntimeManagerPlugin(QWidget):
             else:
                 del self.environments['custom'][item.env_name][item.module_name]
             
-            self.save_environments()
-            self.refresh_tree()
+            self._mark_dirty()
+            item.parent().removeChild(item)
     
     def add_module_to_env(self, env_name):
         editor = ModuleEditor(self, edit_mode=True)
         if editor.exec_() == QDialog.Accepted:
             module_data = editor.get_module_data()
             module_name = module_data['name']
-            source_path = module_data['path']
             
             if module_name in self.environments['custom'][env_name]:
                 reply = QMessageBox.question(
@@ -544,17 +829,12 @@ class RuntimeManagerPlugin(QWidget):
                 if reply != QMessageBox.Yes:
                     return
             
-            new_path = editor.copy_module_to_runtime(source_path, env_name, module_name)
-            if new_path:
-                module_data['path'] = new_path
-                self.environments['custom'][env_name][module_name] = module_data
-                self.save_environments()
-                self.refresh_tree()
-                QMessageBox.information(self, "Success", f"Module '{module_name}' has been copied to runtime environment.")
-            else:
-                QMessageBox.warning(self, "Error", "Failed to copy module to runtime directory.")
+            self.start_module_copy(self.environments['custom'][env_name], env_name, module_data)
     
     def rename_environment(self, item):
+        if self._is_copy_target(item.env_name):
+            QMessageBox.warning(self, "Busy", "A module is still being copied into this environment, please wait until it finishes.")
+            return
         new_name, ok = QInputDialog.getText(
             self, "Rename Environment", 
             "Please enter the new environment name:", 
@@ -565,16 +845,26 @@ class RuntimeManagerPlugin(QWidget):
             new_name = new_name.strip()
             if new_name not in self.environments['custom']:
                 # rename environment
-                modules = self.environments['custom'][item.env_name]
-                del self.environments['custom'][item.env_name]
+                old_name = item.env_name
+                modules = self.environments['custom'][old_name]
+                del self.environments['custom'][old_name]
                 self.environments['custom'][new_name] = modules
                 
-                self.save_environments()
-                self.refresh_tree()
+                self._mark_dirty()
+                
+                item.setText(0, new_name)
+                item.env_name = new_name
+                for i in range(item.childCount()):
+                    item.child(i).env_name = new_name
+                self._env_items[new_name] = self._env_items.pop(old_name)
+                self._update_env_icon(item)
             else:
                 QMessageBox.warning(self, "Error", "Environment name already exists")
     
     def delete_environment(self, item):
+        if self._is_copy_target(item.env_name):
+            QMessageBox.warning(self, "Busy", "A module is still being copied into this environment, please wait until it finishes.")
+            return
         reply = QMessageBox.question(
             self, "Confirm Delete", 
             f"Are you sure you want to delete the environment '{item.env_name}'?\nThis will delete all modules in the environment and remove their files from runtime directory.",
@@ -582,7 +872,7 @@ class RuntimeManagerPlugin(QWidget):
         )
         
         if reply == QMessageBox.Yes:
-            env_dir = os.path.join(os.getcwd(), 'runtime', item.env_name)
+            env_dir = os.path.join(self._runtime_base, item.env_name)
             if os.path.exists(env_dir):
                 try:
                     shutil.rmtree(env_dir)
@@ -591,12 +881,24 @@ class RuntimeManagerPlugin(QWidget):
                     print(f"Failed to delete environment directory: {str(e)}")
             
             del self.environments['custom'][item.env_name]
-            self.save_environments()
-            self.refresh_tree()
+            self._mark_dirty()
+            self._custom_root.removeChild(self._env_items.pop(item.env_name))
+    
+    def _activated_custom_envs(self):
+        # 'base' is tracked in activated_environments too, but is managed by the main program
+        return [n for n in self.activated_environments if n in self.environments['custom']]
+    
+    def deactivate_all(self):
+        names = self._activated_custom_envs()
+        removed_paths, removed_env_paths = self.deactivate_many(names)
+        QMessageBox.information(self, "Environment Deactivated",
+                                f"{len(names)} environments have been deactivated.\n"
+                                f"Removed {removed_paths} paths from Python path.\n"
+                                f"Removed {removed_env_paths} paths from PATH environment variable.")
     
     def activate_environment(self, item):
         env_name = item.env_name
-        env_dir = os.path.join(os.getcwd(), 'runtime', env_name)
+        env_dir = os.path.join(self._runtime_base, env_name)
         
         if not os.path.exists(env_dir):
             QMessageBox.warning(self, "Environment Not Found", 
@@ -606,73 +908,85 @@ class RuntimeManagerPlugin(QWidget):
         added_paths = []
         added_env_paths = []
         
-        # 首先添加环境目录本身到sys.path
-        if env_dir not in sys.path:
-            sys.path.insert(0, env_dir)
-            added_paths.append(env_dir)
-            print(f"Adding environment directory to sys.path: {env_dir}")
-        
         # 获取环境中的所有模块信息
         modules = self.environments['custom'].get(env_name, {})
         
+        # Snapshot sys.path and PATH into sets for O(1) membership tests;
+        # new entries are collected and prepended in one step at the end.
+        # PATH is only read when a common module could contribute to it.
+        sys_path_set = set(sys.path)
+        needs_path_edit = any(m.get('type', 'package') == 'common' and m.get('path')
+                              for m in modules.values())
+        if needs_path_edit:
+            current_path = os.environ.get('PATH', '')
+            path_entries = current_path.split(os.pathsep) if current_path else []
+        else:
+            path_entries = []
+        path_env_set = set(path_entries)
+        
+        # 首先添加环境目录本身到sys.path
+        if env_dir not in sys_path_set:
+            sys_path_set.add(env_dir)
+            added_paths.append(env_dir)
+        
         for module_name, module_data in modules.items():
             module_type = module_data.get('type', 'package')
             module_path = module_data.get('path', '')
 
             # check if the module path is relative to the environment directory
-            if module_path.startswith(env_dir):
-                module_path = os.path.join(os.getcwd(), module_path)
+            if os.path.normpath(module_path).startswith(env_dir):
+                module_path = os.path.join(self._cwd, module_path)
             
             if not module_path or not os.path.exists(module_path):
                 continue
             
             if module_type == 'package':
                 # Python Package: Add module directory to sys.path
-                if module_path not in sys.path:
-                    print(f"Adding Python package to sys.path: {module_path}")
-                    sys.path.insert(0, module_path)
+                if module_path not in sys_path_set:
+                    sys_path_set.add(module_path)
                     added_paths.append(module_path)
             elif module_type == 'common':
                 # Common Module: Add module directory to sys.path and PATH environment variable
-                if module_path not in sys.path:
-                    sys.path.insert(0, module_path)
+                if module_path not in sys_path_set:
+                    sys_path_set.add(module_path)
                     added_paths.append(module_path)
                 
                 # Add to PATH environment variable
-                current_path = os.environ.get('PATH', '')
-                if module_path not in current_path:
-                    if current_path:
-                        os.environ['PATH'] = module_path + os.pathsep + current_path
-                    else:
-                        os.environ['PATH'] = module_path
+                if module_path not in path_env_set:
+                    path_env_set.add(module_path)
                     added_env_paths.append(module_path)
         
         # If there is no module information, use the traditional method (backward compatibility)
         if not modules:
-            if env_dir not in sys.path:
-                sys.path.insert(0, env_dir)
-                added_paths.append(env_dir)
-            
-            for module_name in os.listdir(env_dir):
-                module_path = os.path.join(env_dir, module_name)
-                if os.path.isdir(module_path) and module_path not in sys.path:
-                    sys.path.insert(0, module_path)
-                    added_paths.append(module_path)
+            with os.scandir(env_dir) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False) and entry.path not in sys_path_set:
+                        sys_path_set.add(entry.path)
+                        added_paths.append(entry.path)
+        
+        # Later entries take precedence, as if each had been inserted at the front
+        if added_paths:
+            sys.path[:0] = added_paths[::-1]
+        if added_env_paths:
+            os.environ['PATH'] = os.pathsep.join(added_env_paths[::-1] + path_entries)
+        
+        logger.info("Activated env %s: added %d sys.path, %d PATH entries",
+                    env_name, len(added_paths), len(added_env_paths))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Added sys.path entries: %s", added_paths)
+            logger.debug("Added PATH entries: %s", added_env_paths)
         
         # update activate status
         self.activated_environments.add(env_name)
-        self.refresh_tree()
+        self._update_env_icon(self._env_items[env_name])
         
         if added_paths or added_env_paths:
-            message = f"Environment '{env_name}' has been activated.\n"
+            lines = [f"Environment '{env_name}' has been activated."]
             if added_paths:
-                message += f"Added {len(added_paths)} paths to Python path.\n"
+                lines.append(f"Added {len(added_paths)} paths to Python path.")
             if added_env_paths:
-                message += f"Added {len(added_env_paths)} paths to PATH environment variable."
-            QMessageBox.information(self, "Environment Activated", message)
-            print(f"Environment '{env_name}' has been activated.\n")
-            print(f"Sys.path: {sys.path}")
-            print(f"PATH: {os.environ.get('PATH')}")
+                lines.append(f"Added {len(added_env_paths)} paths to PATH environment variable.")
+            QMessageBox.information(self, "Environment Activated", "\n".join(lines))
         else:
             QMessageBox.information(self, "Environment Activated", 
                                   f"Environment '{env_name}' was already activated.")
@@ -680,91 +994,137 @@ class RuntimeManagerPlugin(QWidget):
     def deactivate_environment(self, item):
         """去激活环境 - 从sys.path中移除环境路径"""
         env_name = item.env_name
-        env_dir = os.path.join(os.getcwd(), 'runtime', env_name)
+        removed_paths, removed_env_paths = self._deactivate(env_name)
         
-        removed_paths = []
-        removed_env_paths = []
+        if removed_paths or removed_env_paths:
+            lines = [f"Environment '{env_name}' has been deactivated."]
+            if removed_paths:
+                lines.append(f"Removed {len(removed_paths)} paths from Python path.")
+            if removed_env_paths:
+                lines.append(f"Removed {len(removed_env_paths)} paths from PATH environment variable.")
+            QMessageBox.information(self, "Environment Deactivated", "\n".join(lines))
+        else:
+            QMessageBox.information(self, "Environment Deactivated", 
+                                  f"Environment '{env_name}' was not activated.")
+    
+    def deactivate_many(self, names):
+        """批量去激活多个环境，树节点图标只在最后统一刷新一次"""
+        changed = []
+        total_paths = total_env_paths = 0
+        for env_name in names:
+            was_active = env_name in self.activated_environments
+            removed_paths, removed_env_paths = self._deactivate(env_name, refresh=False)
+            total_paths += len(removed_paths)
+            total_env_paths += len(removed_env_paths)
+            if was_active or removed_paths or removed_env_paths:
+                changed.append(env_name)
+        
+        if changed:
+            self.tree.setUpdatesEnabled(False)
+            try:
+                for env_name in changed:
+                    env_item = self._env_items.get(env_name)
+                    if env_item is not None:
+                        self._update_env_icon(env_item)
+            finally:
+                self.tree.setUpdatesEnabled(True)
+        return total_paths, total_env_paths
+    
+    def _deactivate(self, env_name, refresh=True):
+        """从sys.path和PATH中移除环境路径，返回(移除的sys.path路径, 移除的PATH路径)"""
+        env_dir = os.path.join(self._runtime_base, env_name)
         
-        # 首先移除环境目录本身
-        if env_dir in sys.path:
-            sys.path.remove(env_dir)
-            removed_paths.append(env_dir)
-            print(f"Removing environment directory from sys.path: {env_dir}")
+        removed_paths = set()
+        removed_env_paths = set()
         
         # 获取环境中的所有模块信息
         modules = self.environments['custom'].get(env_name, {})
         
-        # 根据模块信息移除路径
-        for module_name, module_data in modules.items():
-            module_type = module_data.get('type', 'package')
-            module_path = module_data.get('path', '')
-            
-            if module_path:
-                # 从sys.path移除
-                if module_path in sys.path:
-                    sys.path.remove(module_path)
-                    removed_paths.append(module_path)
-                
-                # 从PATH环境变量移除
-                if module_type == 'common':
-                    current_path = os.environ.get('PATH', '')
-                    if module_path in current_path:
-                        # 移除路径并重新设置PATH
-                        path_parts = current_path.split(os.pathsep)
-                        path_parts = [p for p in path_parts if p != module_path]
-                        os.environ['PATH'] = os.pathsep.join(path_parts)
-                        removed_env_paths.append(module_path)
-        
-        # 如果没有模块信息，使用传统方法（向后兼容）
+        # sys.path中需要移除的路径：环境目录本身及各模块路径，一次性规范化
+        # （兼容Windows大小写与分隔符差异）
+        sys_paths_to_remove = {_npkey(env_dir)}
+        sys_paths_to_remove.update(_npkey(m['path']) for m in modules.values() if m.get('path'))
+        
+        # PATH中需要移除的路径
+        paths_to_remove = {_npkey(m['path'])
+                           for m in modules.values()
+                           if m.get('type', 'package') == 'common' and m.get('path')}
+        
+        # 如果没有模块信息，使用传统方法（向后兼容）：移除环境中的模块目录
+        # 环境目录可能在程序外被创建或填充，每次都以磁盘为准；不存在时直接跳过
         if not modules:
-            # 从sys.path中移除环境目录
-            if env_dir in sys.path:
-                sys.path.remove(env_dir)
-                removed_paths.append(env_dir)
-            
-            # 移除环境中的模块目录
-            if os.path.exists(env_dir):
-                for module_name in os.listdir(env_dir):
-                    module_path = os.path.join(env_dir, module_name)
-                    if os.path.isdir(module_path) and module_path in sys.path:
-                        sys.path.remove(module_path)
-                        removed_paths.append(module_path)
+            try:
+                with os.scandir(env_dir) as it:
+                    sys_paths_to_remove.update(_npkey(entry.path) for entry in it
+                                               if entry.is_dir(follow_symlinks=False))
+            except FileNotFoundError:
+                pass
+        
+        # 一次性重建sys.path和PATH
+        kept_sys_path = []
+        for p in sys.path:
+            if p and _npkey(p) in sys_paths_to_remove:
+                removed_paths.add(p)
+            else:
+                kept_sys_path.append(p)
+        if removed_paths:
+            sys.path[:] = kept_sys_path
+        if paths_to_remove:
+            kept = []
+            for p in os.environ.get('PATH', '').split(os.pathsep):
+                key = _npkey(p) if p else p
+                if key in paths_to_remove:
+                    removed_env_paths.add(key)
+                else:
+                    kept.append(p)
+            if removed_env_paths:
+                os.environ['PATH'] = os.pathsep.join(kept)
         
-        # 更新激活状态
+        logger.info("Deactivated env %s: removed %d sys.path, %d PATH entries",
+                    env_name, len(removed_paths), len(removed_env_paths))
+        
+        # 更新激活状态，仅在状态确有变化时刷新树节点
+        was_active = env_name in self.activated_environments
         self.activated_environments.discard(env_name)
-        self.refresh_tree()
+        if refresh and (was_active or removed_paths or removed_env_paths):
+            self._update_env_icon(self._env_items[env_name])
         
-        if removed_paths or removed_env_paths:
-            message = f"Environment '{env_name}' has been deactivated.\n"
-            if removed_paths:
-                message += f"Removed {len(removed_paths)} paths from Python path.\n"
-            if removed_env_paths:
-                message += f"Removed {len(removed_env_paths)} paths from PATH environment variable."
-            QMessageBox.information(self, "Environment Deactivated", message)
-        else:
-            QMessageBox.information(self, "Environment Deactivated", 
-                                  f"Environment '{env_name}' was not activated.")
+        return removed_paths, removed_env_paths
     
     def load_environments(self):
-        path = os.path.join(os.getcwd(), 'plugins', 'runtime_manager', 'environments.json')
+        path = self._env_file
         if os.path.exists(path):
             try:
-                with open(path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    self.environments = data
+                self.environments = _load_json_file(path, os.path.getsize(path))
             except Exception as e:
                 print(f"Load environment data failed: {str(e)}")
     
     def save_environments(self):
-        path = os.path.join(os.getcwd(), 'plugins', 'runtime_manager', 'environments.json')
-        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if not self._env_dirty:
+            return
+        path = self._env_file
+        if not self._save_dir_ready:
+            os.makedirs(self._env_dir, exist_ok=True)
+            self._save_dir_ready = True
         
         try:
-            with open(path, 'w', encoding='utf-8') as f:
-                json.dump(self.environments, f, indent=2, ensure_ascii=False)
+            # write to a temp file and swap it in, so a crash never leaves a truncated file
+            payload = _dumps(self.environments)
+            tmp_path = path + '.tmp'
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0), 0o644)
+            try:
+                view = memoryview(payload)
+                while view:  # os.write may be partial for large payloads
+                    view = view[os.write(fd, view):]
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+            os.replace(tmp_path, path)
+            self._env_dirty = False
         except Exception as e:
             print(f"Save environment data failed: {str(e)}")
 
 class Plugin:
     def run(self):
-        return RuntimeManagerPlugin()
+        # plugin_path is injected by the main program after construction
+        return RuntimeManagerPlugin(plugin_path=getattr(self, 'plugin_path', None))